@@ -8,9 +8,239 @@ It works by recursively dividing the set of symbols into two subsets with
 probabilities as close as possible, and assigning '0' to one subset and '1' to
 the other.
 '''
+from bisect import bisect_left # Binary search over the running frequency totals
 from collections import Counter # Import Counter to easily count symbol frequencies
+from collections.abc import Mapping # Base class giving Codebook a read-only dict interface
+from functools import lru_cache # Caches Codebooks for repeated frequencies and code dictionaries
+from itertools import accumulate, repeat # Running (prefix) sums; repeated bisect arguments
+from operator import itemgetter # C-level sort key for (symbol, frequency) tuples
 
-def shannon_fano_encode(data):
+# Number of symbols of str/bytes input counted per block when calculating
+# frequencies, so that large inputs are streamed through in bounded pieces.
+HISTOGRAM_BLOCK_SIZE = 1 << 18
+
+# Number of symbols of str/bytes input turned into bits per block by pack_bits.
+# Each block is expanded to one character per bit before being packed, so this
+# bounds the size of that intermediate string.
+ENCODE_BLOCK_SIZE = 1 << 16
+
+# Maximum number of decoder states (trie nodes) that get a row of byte
+# transitions in a Codebook's decode table. A byte-sized alphabet has at most
+# 255 internal nodes, so its table is never cut short; larger alphabets decode
+# the bytes of any further states bit by bit instead of growing the table.
+DECODE_TABLE_MAX_ROWS = 256
+
+class Codebook(Mapping):
+    """
+    The Shannon-Fano codes for a set of symbols.
+
+    A Codebook is a read-only dictionary mapping each symbol to its binary code
+    as a string (e.g. {'A': '0', 'B': '10'}). The codes are stored as
+    (code, length) integer pairs, e.g. "011" is (3, 3), and a bit string is
+    only formatted when it is looked up.
+
+    When every symbol is byte-sized (byte values from bytes input, or
+    characters of a Latin-1 string), the codes are also laid out as two
+    parallel lists indexed by byte value, so the encoder can look a symbol's
+    code up without hashing it.
+
+    The decode trie is built (and the codes are checked to be prefix-free)
+    once, when the Codebook is created. The decoder's transition table is
+    kept alongside it, so repeated decoding with the same Codebook reuses
+    both instead of rebuilding them on every call.
+
+    Attributes:
+        code_int: A list of 256 code values indexed by byte value, or None if
+                  the alphabet is not byte-sized.
+        code_len: A list of 256 code lengths indexed by byte value (0 for byte
+                  values without a code), or None if the alphabet is not
+                  byte-sized.
+        trie_root: The root node of the binary trie of the codes (see
+                   _build_decode_trie).
+        lut: The decoder's transition table (see _decode_packed). It starts
+             empty and is filled in as data is decoded, up to
+             DECODE_TABLE_MAX_ROWS rows of 256 transitions: about 5 MB once
+             every byte has been seen in every state, and usually far less.
+             Codebooks are cached (see _build_codebook and _as_codebook), so
+             this memory stays allocated until a Codebook drops out of its
+             cache.
+    """
+
+    def __init__(self, int_codes, trie_root=None):
+        """
+        Args:
+            int_codes: A dictionary mapping symbols to (code, length) integer pairs.
+            trie_root: The root of an already built decode trie for int_codes,
+                       which is trusted as is. If omitted, the trie is built
+                       (and the codes are validated) from int_codes.
+
+        Raises:
+            ValueError: If the codes are not prefix-free.
+        """
+        self._int_codes = int_codes
+        self.trie_root = _build_decode_trie(int_codes) if trie_root is None else trie_root
+        self.lut = {}
+        self._byte_type = None # bytes or str when the alphabet is byte-sized
+        self._bit_strings = None # Code strings formatted by bit_string_table()
+        self.code_int = None
+        self.code_len = None
+
+        if int_codes and all(type(symbol) is int and 0 <= symbol < 256 for symbol in int_codes):
+            self._byte_type = bytes
+            ordinals = list(int_codes)
+        elif int_codes and all(type(symbol) is str and len(symbol) == 1 and symbol <= '\xff'
+                               for symbol in int_codes):
+            self._byte_type = str
+            ordinals = [ord(symbol) for symbol in int_codes]
+        else:
+            return
+
+        self.code_int = [0] * 256
+        self.code_len = [0] * 256
+        for ordinal, (code, length) in zip(ordinals, int_codes.values()):
+            self.code_int[ordinal] = code
+            self.code_len[ordinal] = length
+
+    def __getitem__(self, symbol):
+        code, length = self._int_codes[symbol]
+        return format(code, f'0{length}b') # format(3, '03b') == "011"
+
+    def __iter__(self):
+        return iter(self._int_codes)
+
+    def __len__(self):
+        return len(self._int_codes)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def int_code(self, symbol):
+        """
+        Returns the code of a symbol as a (code, length) integer pair.
+        """
+        return self._int_codes[symbol]
+
+    def bit_string_table(self):
+        """
+        Returns the codes as '0'/'1' strings, formatted once and then reused.
+
+        For byte-sized alphabets this is a str.translate table: a list where
+        entry b is the code of byte value b, or 'x' if byte value b has no
+        code. For other alphabets it is a dictionary mapping symbols to codes.
+        """
+        if self._bit_strings is None:
+            if self._byte_type is None:
+                self._bit_strings = dict(self.items())
+            else:
+                self._bit_strings = [format(code, f'0{length}b') if length else 'x'
+                                     for code, length in zip(self.code_int, self.code_len)]
+        return self._bit_strings
+
+    def byte_values(self, data):
+        """
+        Returns data as byte values indexing code_int and code_len.
+
+        Args:
+            data: The data to be encoded with this codebook.
+
+        Returns:
+            A bytes object, or None if the data cannot be encoded through the
+            byte-indexed lists (the alphabet is not byte-sized, or data is not
+            of the matching str or bytes type).
+        """
+        if self._byte_type is None or not isinstance(data, self._byte_type):
+            return None
+        if self._byte_type is bytes:
+            return data
+        try:
+            return data.encode('latin-1')
+        except UnicodeEncodeError: # Contains characters that have no code anyway
+            return None
+
+def _as_codebook(codes):
+    """
+    Returns codes as a Codebook, converting a plain {symbol: bit string} dictionary.
+
+    Conversions are cached by the dictionary's contents, so passing the same
+    codes again reuses the Codebook, along with its decode trie and tables.
+    The 32 most recently converted Codebooks are kept alive by the cache.
+    """
+    if isinstance(codes, Codebook):
+        return codes
+    # Symbol types are part of the key, as 1, 1.0 and True compare equal
+    return _codebook_from_bit_strings(frozenset((type(symbol), symbol, bits)
+                                                for symbol, bits in codes.items()))
+
+@lru_cache(maxsize=32)
+def _codebook_from_bit_strings(items):
+    """
+    Builds a Codebook from a frozenset of (symbol type, symbol, bit string) tuples.
+
+    Raises:
+        ValueError: If a code is not a non-empty string of '0' and '1'
+                    characters, or the codes are not prefix-free.
+    """
+    int_codes = {}
+    for _, symbol, bits in items:
+        if not bits or bits.strip('01'):
+            raise ValueError(f"The code of {symbol!r} is not a string of bits: {bits!r}")
+        int_codes[symbol] = (int(bits, 2), len(bits))
+    return Codebook(int_codes)
+
+def _byte_histogram(blocks):
+    """
+    Counts how often each byte value occurs in a sequence of byte blocks.
+
+    Args:
+        blocks: An iterable of bytes-like objects.
+
+    Returns:
+        A Counter mapping byte values to their frequencies. Byte values are
+        listed in order of their first occurrence, as Counter(data) lists
+        symbols, so symbols with equal frequencies keep that order when sorted.
+    """
+    # Iterating bytes yields small ints, which hash trivially and are cached by
+    # the interpreter, so this is cheaper than counting 1-character strings.
+    counts = Counter()
+    for block in blocks:
+        counts.update(block)
+    return counts
+
+def _symbol_frequencies(data):
+    """
+    Calculates the frequency of each symbol in the input data.
+
+    Strings whose characters all fit in a single byte (Latin-1) and bytes
+    objects are counted by byte value, one block of HISTOGRAM_BLOCK_SIZE
+    symbols at a time. Any other input (e.g. a list of arbitrary symbols)
+    falls back to a plain Counter.
+
+    Args:
+        data: A string, bytes object or iterable of hashable symbols.
+
+    Returns:
+        A list of (symbol, frequency) tuples in order of first occurrence.
+        Symbols are 1-character strings for string input and integers (byte
+        values) for bytes input.
+    """
+    if isinstance(data, bytes):
+        block_starts = range(0, len(data), HISTOGRAM_BLOCK_SIZE)
+        histogram = _byte_histogram(data[start:start + HISTOGRAM_BLOCK_SIZE] for start in block_starts)
+        return list(histogram.items())
+    if isinstance(data, str):
+        # Converting block by block means a large string is never copied as a
+        # whole; only one block-sized bytes object exists at a time.
+        block_starts = range(0, len(data), HISTOGRAM_BLOCK_SIZE)
+        try:
+            histogram = _byte_histogram(data[start:start + HISTOGRAM_BLOCK_SIZE].encode('latin-1')
+                                        for start in block_starts)
+        except UnicodeEncodeError: # Characters outside Latin-1 need the generic path
+            return list(Counter(data).items())
+        return [(chr(byte), count) for byte, count in histogram.items()]
+    # Counter will create a dictionary-like object: e.g., {'A': 5, 'B': 3, ...}
+    return list(Counter(data).items())
+
+def shannon_fano_encode(data, frequency=None):
     """
     Encodes the input data using the Shannon-Fano algorithm.
 
@@ -23,131 +253,421 @@ def shannon_fano_encode(data):
        in the second partition, and repeating the process for each partition.
 
     Args:
-        data: A string or list of symbols (e.g., characters) to be encoded.
+        data: A string, bytes object or list of symbols to be encoded. Pass
+              strings and bytes as they are: each character (or byte value)
+              is a distinct symbol, and these types are counted without
+              creating an object per symbol, so there is no need to convert
+              them to a list first. Bytes are encoded as integer byte values.
+        frequency: Optional dictionary mapping symbols to their frequencies
+                   (e.g. a Counter). When given, the codes are built from it
+                   and data is not counted, so a stream with a known or fixed
+                   distribution can skip step 1 for every chunk. The
+                   frequencies can be counts (ints) or probabilities (floats
+                   or Fractions); any non-negative real numbers that can be
+                   added and halved work, and zero is allowed.
 
     Returns:
-        A dictionary where keys are the original symbols and values are their
-        corresponding Shannon-Fano binary codes (as strings).
-    """
-    if not data: # Handle empty input
-        return {}
+        A Codebook: a read-only dictionary where keys are the original symbols
+        and values are their corresponding Shannon-Fano binary codes (as strings).
+        Codebooks are cached, so encoding data with the same symbol frequencies
+        again returns the same Codebook without rebuilding it.
 
+    Raises:
+        ValueError: If a frequency given in frequency is negative.
+    """
     # Step 1: Calculate frequency of each symbol
-    # Counter will create a dictionary-like object: e.g., {'A': 5, 'B': 3, ...}
-    frequency = Counter(data)
+    # e.g., [('A', 5), ('B', 2), ('C', 1), ...]
+    if frequency is None:
+        if not data: # Handle empty input
+            return Codebook({})
+        frequency = _symbol_frequencies(data)
+    else:
+        frequency = list(frequency.items())
+        if any(freq < 0 for _, freq in frequency):
+            raise ValueError("Symbol frequencies must not be negative")
+        if not frequency:
+            return Codebook({})
 
     # Step 2: Sort symbols by frequency in descending order
     # This returns a list of tuples, e.g., [('A', 5), ('B', 3), ('R', 2), ...]
-    sorted_symbols = sorted(frequency.items(), key=lambda item: item[1], reverse=True)
+    # itemgetter extracts the sort keys in C, without a Python-level call per symbol.
+    sorted_symbols = sorted(frequency, key=itemgetter(1), reverse=True)
 
-    codes = {} # This dictionary will store the final codes for each symbol
+    # Equal symbols of different types (1, 1.0 and True) compare equal, so the
+    # types are part of the cache key; otherwise they would share a Codebook.
+    return _build_codebook(tuple(sorted_symbols),
+                           tuple(type(symbol) for symbol, _ in sorted_symbols))
 
-    # Step 3 & 4: Recursively assign codes
-    def assign_codes(symbols_with_freq, current_code=""):
-        """
-        A recursive helper function to assign binary codes to symbols.
+@lru_cache(maxsize=64)
+def _build_codebook(sorted_symbols, symbol_types):
+    """
+    Builds the Codebook for a list of symbols sorted by frequency (steps 3 and 4
+    of shannon_fano_encode).
 
-        Args:
-            symbols_with_freq: A list of (symbol, frequency) tuples, sorted by frequency.
-            current_code: The binary code string built so far for the current path
-                          in the Shannon-Fano tree.
-        """
-        if not symbols_with_freq: # Base case: no symbols left
-            return
+    The result depends only on the sorted (symbol, frequency) pairs, so it is
+    cached: repeated encodes of data with the same distribution reuse it. The
+    cache keeps the 64 most recently used Codebooks alive, along with their
+    decode tables (see Codebook.lut).
 
-        # Base case: If there's only one symbol left in the current list,
-        # assign the accumulated current_code to it. This is a leaf node in the tree.
-        if len(symbols_with_freq) == 1:
-            symbol, _ = symbols_with_freq[0]
-            codes[symbol] = current_code if current_code else "0" # Handle single symbol case
-            return
+    Args:
+        sorted_symbols: A non-empty tuple of (symbol, frequency) tuples, sorted
+                        by frequency in descending order.
+        symbol_types: A tuple of the types of the symbols. It is only used as
+                      part of the cache key.
+
+    Returns:
+        The Codebook for the symbols.
+    """
+    # Codes are accumulated as packed (code, length) integer pairs rather than
+    # strings, so descending one level of the tree is a shift and an OR instead
+    # of allocating a new string. e.g. the bit string "011" is stored as (3, 3).
+    int_codes = {}
+
+    # Every partition is a contiguous slice of sorted_symbols, so it is described
+    # by an index range instead of a copied sub-list. The running totals let any
+    # partition's frequency sum be read off in O(1):
+    # prefix[i] == sum of the frequencies of sorted_symbols[0...i]
+    symbols, freqs = zip(*sorted_symbols) # Split into parallel sequences
+    prefix = list(accumulate(freqs))
+
+    # Step 3 & 4: Assign codes one level of the Shannon-Fano tree at a time.
+    # Each partition still to be split is a (lo, hi, base, total_freq, code, node) entry:
+    # - sorted_symbols[lo...hi-1] is the partition,
+    # - base is the frequency of everything before it (prefix[lo - 1], or 0),
+    # - total_freq is the sum of its frequencies,
+    # - code holds the bits accumulated so far for its path in the tree; every
+    #   partition on a level has a code of the same length, and
+    # - node is the partition's internal node in the decode trie (see
+    #   _build_decode_trie), which is built here as a by-product of splitting.
+    # The totals of both halves are known once a partition is split, so they
+    # are handed down instead of being recomputed for every partition.
+    # Start with all sorted symbols and an empty code.
+    root = [None, None]
+    if len(symbols) == 1:
+        # Handle single symbol case: a lone symbol still needs a one-bit code ("0")
+        int_codes[symbols[0]] = (0, 1)
+        root[0] = (symbols[0],)
+        level = []
+    else:
+        level = [(0, len(symbols), 0, prefix[-1], 0, root)]
+    length = 0
+    while level:
+        length += 1 # Length of the codes of the partitions created on this level
 
-        # Find the split point: Divide the list into two sub-lists (partitions)
-        # such that the sum of frequencies in each sub-list is as close as possible.
-        total_freq = sum(freq for _, freq in symbols_with_freq) # Sum of all frequencies in current list
-        cumulative_freq = 0 # To track the sum of frequencies for the first partition
-        split_index = 0     # The index where the list will be split
-        min_diff = float('inf') # Initialize with a very large difference
-
-        # Iterate through the symbols to find the best split point
-        for i, (_, freq) in enumerate(symbols_with_freq[:-1]): # Exclude last element for split
-            cumulative_freq += freq
-            # Difference between the sum of frequencies of the two potential partitions
-            # Partition 1: symbols_with_freq[0...i]
-            # Partition 2: symbols_with_freq[i+1...end]
-            # Sum of Partition 1 = cumulative_freq
-            # Sum of Partition 2 = total_freq - cumulative_freq
-            diff = abs(cumulative_freq - (total_freq - cumulative_freq))
-
-            if diff < min_diff:
-                min_diff = diff
-                split_index = i + 1 # The split occurs *after* index i
-            # If the difference starts increasing, we might have passed the optimal split point,
-            # especially if the cumulative frequency has already exceeded half of the total.
-            # This heuristic helps in cases where multiple splits give the same minimum difference.
-            elif diff >= min_diff and cumulative_freq > total_freq / 2:
-                break
-        
-        # The split_index is determined by the loop above. 
-        # If symbols_with_freq has 2+ items, the loop runs at least once, 
-        # setting split_index to at least 1.
-        # If symbols_with_freq has 0 or 1 item, earlier base cases handle it.
-
-        # This case should ideally not be hit if the loop runs correctly up to symbols_with_freq[:-1]
-        # elif split_index == len(symbols_with_freq) and len(symbols_with_freq) > 1:
-        #     split_index = len(symbols_with_freq) - 1
-
-
-        # Create the two partitions
-        left_partition = symbols_with_freq[:split_index]  # First part of the list
-        right_partition = symbols_with_freq[split_index:] # Second part of the list
-
-        # Recursively call assign_codes for the left partition, appending '0' to the current code.
-        assign_codes(left_partition, current_code + "0")
-        # Recursively call assign_codes for the right partition, appending '1' to the current code.
-        assign_codes(right_partition, current_code + "1")
-
-    # Start the recursive process with all sorted symbols and an empty initial code.
-    assign_codes(sorted_symbols)
-    return codes
-
-def shannon_fano_decode(encoded_data, codes):
-    """
-    Decodes the input bit string using the provided Shannon-Fano codes.
-
-    It works by reading the encoded bit string sequentially, matching the
-    accumulated bits against the known codes. Once a match is found, the
-    corresponding symbol is recorded, and the process repeats for the
-    remainder of the bit string.
+        # Find the split points: Divide each range into two partitions such that
+        # the sum of frequencies in each partition is as close as possible.
+        # Partition 1 is sorted_symbols[lo...i] with sum prefix[i] - base, and
+        # partition 2 is the rest of the range. Frequencies are not negative, so
+        # the difference |2 * (prefix[i] - base) - total_freq| never grows until
+        # partition 1 holds half of the total and never shrinks after that. The
+        # best i is therefore either the first index reaching half of the total
+        # or the one before it.
+        # The last symbol is excluded so that partition 2 is never empty.
+        # The first index where 2 * (prefix[i] - base) >= total_freq is found for
+        # every partition of the level in one batch of binary searches. For
+        # integer frequencies that is prefix[i] >= base + ceil(total_freq / 2);
+        # other numbers (floats, Fractions) are compared against half of the
+        # total as it is.
+        firsts = map(bisect_left, repeat(prefix),
+                     [base + ((total_freq + 1) // 2 if type(total_freq) is int else total_freq / 2)
+                      for _, _, base, total_freq, _, _ in level],
+                     [lo for lo, _, _, _, _, _ in level],
+                     [hi - 1 for _, hi, _, _, _, _ in level])
+
+        next_level = []
+        for (lo, hi, base, total_freq, code, node), i in zip(level, firsts):
+            if i == hi - 1: # Half of the total is never reached before the last symbol,
+                i -= 1      # so the difference only shrinks and the last candidate wins
+            elif i > lo and (total_freq - 2 * (prefix[i - 1] - base)
+                             <= 2 * (prefix[i] - base) - total_freq):
+                i -= 1 # The candidate just below half is closer (or tied: prefer the earlier split)
+            split_index = i + 1 # The split occurs *after* index i
+            cumulative_freq = prefix[i] - base # Sum of partition 1
+
+            # The left partition gets a 0 bit appended to the code and the right
+            # partition a 1 bit. A partition with only one symbol left is a leaf
+            # node in the tree: its symbol gets the accumulated code.
+            code <<= 1
+            if split_index - lo == 1:
+                int_codes[symbols[lo]] = (code, length)
+                node[0] = (symbols[lo],)
+            else:
+                node[0] = [None, None]
+                next_level.append((lo, split_index, base, cumulative_freq, code, node[0]))
+            if hi - split_index == 1:
+                int_codes[symbols[split_index]] = (code | 1, length)
+                node[1] = (symbols[split_index],)
+            else:
+                node[1] = [None, None]
+                next_level.append((split_index, hi, base + cumulative_freq,
+                                   total_freq - cumulative_freq, code | 1, node[1]))
+        level = next_level
+
+    # The codes are prefix-free by construction, so the trie built above is
+    # handed over instead of being rebuilt (and re-validated) from the codes.
+    return Codebook(int_codes, trie_root=root)
+
+def _build_decode_trie(int_codes):
+    """
+    Builds a binary trie from a Shannon-Fano code table, for use in decoding.
+
+    Internal nodes are two-element lists [zero_child, one_child], with None for
+    a missing child. Leaves are one-element tuples (symbol,), so any symbol
+    (including None) can be stored and leaves are told apart by their type.
 
     Args:
-        encoded_data: A string of bits (e.g., "0110101") representing the
-                      data encoded with Shannon-Fano.
-        codes: A dictionary mapping original symbols to their Shannon-Fano
-               binary codes (the output of shannon_fano_encode).
+        int_codes: A dictionary mapping symbols to (code, length) integer pairs.
 
     Returns:
-        The original decoded string of symbols.
+        The root node of the trie.
+
+    Raises:
+        ValueError: If the codes are not prefix-free, i.e. a code is empty,
+                    equal to another code or the start of another code, so
+                    encoded data could not be decoded unambiguously.
+    """
+    root = [None, None]
+    for symbol, (code, length) in int_codes.items():
+        if length < 1:
+            raise ValueError(f"The code of {symbol!r} is empty")
+        node = root
+        # Walk (and create) the internal nodes for every bit but the last one
+        for shift in range(length - 1, 0, -1):
+            bit = (code >> shift) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None]
+            elif type(child) is tuple: # Another code ends here
+                raise ValueError(f"The code of {child[0]!r} is a prefix of the code of {symbol!r}")
+            node = child
+        # The last bit leads to the leaf, which must not be taken yet
+        if node[code & 1] is not None:
+            raise ValueError(f"The code of {symbol!r} equals or is a prefix of another code")
+        node[code & 1] = (symbol,)
+    return root
+
+def _walk_trie(root, node, value, count):
+    """
+    Follows the low `count` bits of value, MSB-first, through a decode trie.
+
+    Args:
+        root: The root node of the trie (see _build_decode_trie).
+        node: The node to start from.
+        value: An integer holding the bits.
+        count: The number of bits to follow.
+
+    Returns:
+        A (symbols, node) tuple: the symbols whose codes were completed along
+        the way and the node where the walk stopped.
+
+    Raises:
+        ValueError: If the bits leave the trie (they are not a prefix of any code).
+    """
+    symbols = []
+    for shift in range(count - 1, -1, -1):
+        node = node[(value >> shift) & 1] # Follow the 0 or 1 branch
+        if node is None:
+            raise ValueError("Encoded data contains a bit sequence that matches no code")
+        if type(node) is tuple: # Reached a leaf, i.e. a complete code
+            symbols.append(node[0])
+            node = root # Restart from the root for the next symbol's code
+    return symbols, node
+
+def _decode_packed(packed, nbits, root, rows, ordinal=None):
+    """
+    Decodes packed bits a whole byte at a time.
+
+    The decoder's state is the trie node it has reached, i.e. the bits of a
+    code that is still incomplete. The first time a (state, byte) pair is
+    seen, the byte is walked through the trie bit by bit; the symbols it
+    completes and the state after it are then stored, so every later
+    occurrence is a single lookup emitting all of its symbols at once.
+
+    Only the first DECODE_TABLE_MAX_ROWS states reached get a row in the
+    table. Bytes read in any other state are always walked bit by bit, which
+    bounds the table (and the time spent filling it) for large alphabets.
+
+    Args:
+        packed: A bytes object holding the encoded bits, MSB-first.
+        nbits: The number of meaningful bits in packed.
+        root: The root node of the decode trie (see _build_decode_trie).
+        rows: The transition table for this trie. It is filled in as needed
+              and can be passed again to decode more data with the same trie
+              (and the same ordinal).
+        ordinal: For byte-sized alphabets, a function returning the byte value
+                 of a symbol (ord for characters, int for byte values). The
+                 output is then collected as raw bytes instead of a list of
+                 symbol objects.
+
+    Returns:
+        A bytearray of the decoded symbols' byte values if ordinal is given,
+        otherwise a list of decoded symbols. A trailing incomplete code is ignored.
+
+    Raises:
+        ValueError: If the bits contain a sequence that is not a prefix of any code.
+    """
+    # Each state has a row of 256 transitions indexed by byte value. A
+    # transition is a (symbols, next_row, next_node) tuple, or None until first
+    # used; symbols is a bytes object if ordinal is given, otherwise a tuple,
+    # and next_row is None if the next state has no row.
+    # The row's trie node is kept in an extra slot at index 256.
+    # rows maps id(trie node) -> row.
+
+    def row_for(node):
+        row = rows.get(id(node))
+        if row is None and len(rows) < DECODE_TABLE_MAX_ROWS:
+            row = rows[id(node)] = [None] * 256 + [node]
+        return row
+
+    # Byte-sized alphabets are collected in a bytearray: appending a chunk of
+    # bytes copies it in one go and the buffer grows geometrically, with no
+    # object per symbol and no final join over a list.
+    decoded_symbols = bytearray() if ordinal else []
+    node = root
+    row = row_for(root)
+    for byte in packed[:nbits // 8]:
+        if row is None: # A state without a row: walk the byte through the trie
+            symbols, node = _walk_trie(root, node, byte, 8)
+            decoded_symbols += bytes(map(ordinal, symbols)) if ordinal else symbols
+            row = row_for(node)
+            continue
+        transition = row[byte]
+        if transition is None: # First time this byte is seen in this state
+            symbols, node = _walk_trie(root, row[256], byte, 8)
+            symbols = bytes(map(ordinal, symbols)) if ordinal else tuple(symbols)
+            transition = row[byte] = (symbols, row_for(node), node)
+        symbols, row, node = transition
+        decoded_symbols += symbols
+
+    # The meaningful bits of the last, partial byte are walked one at a time
+    tail_bits = nbits % 8
+    if tail_bits:
+        symbols, _ = _walk_trie(root, node, packed[nbits // 8] >> (8 - tail_bits), tail_bits)
+        decoded_symbols += bytes(map(ordinal, symbols)) if ordinal else symbols
+    return decoded_symbols
+
+def _bit_string_blocks(data, codebook):
+    """
+    Yields the codes of the symbols in data as '0'/'1' strings, a block at a time.
+
+    For byte-sized alphabets, str.translate replaces every byte value with its
+    code in a single pass per block of ENCODE_BLOCK_SIZE symbols. Other
+    alphabets are looked up symbol by symbol and yielded as one block.
+
+    Raises:
+        KeyError: If a symbol in data has no code.
+    """
+    raw = codebook.byte_values(data)
+    if raw is None:
+        if codebook._byte_type is not None: # e.g. a list of the alphabet's symbols
+            bit_strings = dict(codebook.items())
+        else:
+            bit_strings = codebook.bit_string_table()
+        yield "".join(map(bit_strings.__getitem__, data))
+        return
+
+    table = codebook.bit_string_table()
+    for start in range(0, len(raw), ENCODE_BLOCK_SIZE):
+        block = raw[start:start + ENCODE_BLOCK_SIZE]
+        bits = block.decode('latin-1').translate(table)
+        if 'x' in bits: # Some byte value has no code
+            missing = next(byte for byte in block if not codebook.code_len[byte])
+            raise KeyError(chr(missing) if isinstance(data, str) else missing)
+        yield bits
+
+def pack_bits(data, codes):
+    """
+    Encodes the input data into a packed bit stream using Shannon-Fano codes.
+
+    Every symbol's code is appended to the stream as real bits (eight per
+    byte, MSB-first) rather than as '0'/'1' characters. The last byte is
+    padded with zero bits.
+
+    Args:
+        data: A string, bytes object or list of symbols to be encoded. Every
+              symbol must have a code in codes.
+        codes: A Codebook (the output of shannon_fano_encode), or a dictionary
+               mapping symbols to their Shannon-Fano binary codes.
+
+    Returns:
+        A (packed, nbits) tuple, where packed is a bytes object holding the
+        encoded bits and nbits is the number of meaningful bits in it.
+
+    Raises:
+        KeyError: If a symbol in data has no code.
+    """
+    codebook = _as_codebook(codes)
+
+    out = bytearray()
+    nbits = 0   # Total number of bits written
+    carry = ""  # Bits following the last complete byte of the previous block
+    for block in _bit_string_blocks(data, codebook):
+        nbits += len(block)
+        bits = carry + block
+        # int() and to_bytes() convert all complete bytes of the block at once
+        whole = len(bits) - len(bits) % 8
+        if whole:
+            out += int(bits[:whole], 2).to_bytes(whole // 8, 'big')
+        carry = bits[whole:]
+    if carry: # Pad the last partial byte with zero bits
+        out.append(int(carry, 2) << (8 - len(carry)))
+    return bytes(out), nbits
+
+def shannon_fano_decode(encoded_data, codes, nbits=None):
+    """
+    Decodes the input bits using the provided Shannon-Fano codes.
+
+    The bits are decoded a byte at a time: each input byte leads, through a
+    table built up while decoding, to all of the symbols whose codes end in it.
+
+    Args:
+        encoded_data: Either packed bits as returned by pack_bits, or a string
+                      of bits (e.g., "0110101") representing the data encoded
+                      with Shannon-Fano.
+        codes: A Codebook (the output of shannon_fano_encode), or a dictionary
+               mapping original symbols to their Shannon-Fano binary codes.
+        nbits: The number of meaningful bits in packed encoded_data (as
+               returned by pack_bits). Defaults to all of its bits, in which
+               case padding bits in the last byte may decode as extra symbols.
+               Ignored for a string of bits.
+
+    Returns:
+        The original decoded string of symbols, or a bytes object if the codes
+        are for byte values (i.e. were built from bytes input).
+
+    Raises:
+        ValueError: If encoded_data is a string containing characters other than
+                    '0' and '1', nbits is negative or larger than the number
+                    of bits in packed encoded_data, the bits contain a
+                    sequence that is not a prefix of any code, or codes is a
+                    dictionary of codes that are not prefix-free.
     """
     if not codes: # If there are no codes (e.g., from empty input to encode), return empty.
         return ""
 
-    # For decoding, it's more efficient to look up by code.
-    # So, invert the codes dictionary: { "00": 'A', "01": 'B', ... }
-    reversed_codes = {v: k for k, v in codes.items()}
-    
-    decoded_symbols = [] # List to store the decoded symbols
-    current_code_segment = "" # Accumulates bits from encoded_data
-
-    # Iterate through each bit in the encoded data string
-    for bit in encoded_data:
-        current_code_segment += bit # Add the current bit to our segment
-        # Check if the accumulated segment matches any known code
-        if current_code_segment in reversed_codes:
-            # If it matches, we found a symbol
-            symbol = reversed_codes[current_code_segment]
-            decoded_symbols.append(symbol)
-            current_code_segment = "" # Reset for the next symbol's code
+    codebook = _as_codebook(codes)
+
+    if isinstance(encoded_data, str):
+        if encoded_data.strip('01'): # int() would also accept e.g. "0b1", " 01 " or "0_1"
+            raise ValueError("Encoded data is not a string of '0' and '1' characters")
+        # Pack the '0'/'1' characters into bytes, MSB-first: "0110101" -> 0b01101010.
+        nbits = len(encoded_data)
+        nbytes = (nbits + 7) // 8
+        value = int(encoded_data, 2) if encoded_data else 0
+        packed = (value << (nbytes * 8 - nbits)).to_bytes(nbytes, 'big')
+    else:
+        packed = bytes(encoded_data)
+        if nbits is None:
+            nbits = len(packed) * 8
+        elif not 0 <= nbits <= len(packed) * 8:
+            raise ValueError(f"nbits must be between 0 and {len(packed) * 8}, got {nbits}")
+
+    if codebook._byte_type is bytes: # Byte values: return them as they are
+        return bytes(_decode_packed(packed, nbits, codebook.trie_root, codebook.lut, int))
+    if codebook._byte_type is str: # Latin-1 characters: one byte per character
+        return _decode_packed(packed, nbits, codebook.trie_root, codebook.lut, ord).decode('latin-1')
+
+    decoded_symbols = _decode_packed(packed, nbits, codebook.trie_root, codebook.lut)
 
     # Join the list of decoded symbols to form the original string
     return "".join(decoded_symbols)
@@ -159,18 +679,18 @@ if __name__ == "__main__":
     data_to_encode = "ABRAACADABRA" # Sample data
     print(f"Original data: {data_to_encode}")
 
-    # Encode the data. It's good practice to pass a list of characters
-    # if your data is a string, to handle each character as a distinct symbol.
-    sf_codes = shannon_fano_encode(list(data_to_encode))
+    # Encode the data. A string can be passed directly; each character is
+    # handled as a distinct symbol.
+    sf_codes = shannon_fano_encode(data_to_encode)
     print(f"Shannon-Fano Codes: {sf_codes}") # Display the generated codes
 
-    # Create the full encoded bit string by looking up the code for each symbol
+    # Create the encoded bit stream by packing the code for each symbol
     # in the original data.
-    encoded_bit_string = "".join(sf_codes[symbol] for symbol in data_to_encode)
-    print(f"Encoded bit string: {encoded_bit_string}")
+    encoded_bits, encoded_length = pack_bits(data_to_encode, sf_codes)
+    print(f"Encoded bits: {encoded_bits.hex()} ({encoded_length} bits)")
 
-    # Decode the bit string back to the original data
-    decoded_data = shannon_fano_decode(encoded_bit_string, sf_codes)
+    # Decode the bit stream back to the original data
+    decoded_data = shannon_fano_decode(encoded_bits, sf_codes, encoded_length)
     print(f"Decoded data: {decoded_data}")
     # Verify that the decoded data matches the original
     assert data_to_encode == decoded_data, "Mismatch between original and decoded data!"
@@ -178,11 +698,11 @@ if __name__ == "__main__":
     # Another example with a different string
     data2 = "shannon fano algorithm example"
     print(f"\nOriginal data: {data2}")
-    sf_codes2 = shannon_fano_encode(list(data2)) # Encode
+    sf_codes2 = shannon_fano_encode(data2) # Encode
     print(f"Shannon-Fano Codes: {sf_codes2}")
-    encoded_bit_string2 = "".join(sf_codes2[symbol] for symbol in data2) # Create bit string
-    print(f"Encoded bit string: {encoded_bit_string2}")
-    decoded_data2 = shannon_fano_decode(encoded_bit_string2, sf_codes2) # Decode
+    encoded_bits2, encoded_length2 = pack_bits(data2, sf_codes2) # Create bit stream
+    print(f"Encoded bits: {encoded_bits2.hex()} ({encoded_length2} bits)")
+    decoded_data2 = shannon_fano_decode(encoded_bits2, sf_codes2, encoded_length2) # Decode
     print(f"Decoded data: {decoded_data2}")
     assert data2 == decoded_data2, "Mismatch in second example!"
     print("\nSuccessfully encoded and decoded both examples.")